@@ -3,18 +3,22 @@ from flask_cors import CORS
 from dotenv import load_dotenv
 from dataclasses import asdict
 import os
-import json
 import uuid
 import requests
 
 from preferences import Preference, PreferenceStore
 from pins import Pin, PinStore
 from itineraries import Itinerary, ItineraryStore
-from place_utils import google_query, haversine_distance, bayesian_avg
+from place_utils import google_query, haversine_distance, bayesian_avg, centroid
+from clustering import cluster_places
+from rescoring import CandidateCache
+from response_cache import ResponseCache
+from serialization import FastJSONProvider, dump_file
 
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '', '.env'))
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 CORS(app)
 
 API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
@@ -94,6 +98,35 @@ BUDGET_SIGNAL_QUERIES = {
 PRICE_LABELS = {0: "free", 1: "budget-friendly", 2: "moderate", 3: "upscale", 4: "luxury"}
 
 
+def cached_response(route, clerk_user_id, version, build):
+    """
+    Serve a read endpoint with an ETag derived from the user's store version.
+    Answers If-None-Match with 304 and reuses the serialized body until the
+    version changes. `build` returns (payload, status); only 200s are cached.
+    Read `version` before reading the data `build` uses, so a concurrent write
+    can only make the ETag older than the body, never newer.
+    """
+    args = tuple(sorted(request.args.items(multi=True)))
+    etag = ResponseCache.etag(route, clerk_user_id, version, args)
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+
+    key = (route, clerk_user_id, args)
+    body = ResponseCache.get(key, etag)
+    if body is None:
+        payload, status = build()
+        if status != 200:
+            return jsonify(payload), status
+        body = jsonify(payload).get_data()
+        ResponseCache.put(key, etag, body)
+
+    response = app.response_class(body, mimetype=app.json.mimetype)
+    response.set_etag(etag)
+    return response
+
+
 def search_places(activities, location, budget, clerk_user_id=None):
     prefs = {}
     if clerk_user_id:
@@ -115,6 +148,7 @@ def search():
     clerk_user_id = request.args.get("clerkUserId")
     prefs = {}
     if clerk_user_id:
+        pref_version = PreferenceStore.version(clerk_user_id)
         prefs = PreferenceStore.get(clerk_user_id) or {}
 
     activities_str = request.args.get("activities", "")
@@ -124,17 +158,36 @@ def search():
 
     city = request.args.get("city", "") or request.args.get("location", "")
 
+    budget_from_prefs = not request.args.get("budget")
     budget = map_budget(request.args.get("budget") or prefs.get("budget", "moderate"))
 
     if not activities or not city:
         return jsonify({"error": "activities and city are required"}), 400
 
-    places = search_places(activities, city, budget, clerk_user_id)
+    # Reuse this user's last candidate set for the same search when we have one;
+    # a budget change is rescored locally instead of hitting Google again.
+    cached = None
+    if clerk_user_id:
+        cached = CandidateCache.get(clerk_user_id, activities, city, budget, budget_from_prefs)
+    if cached is not None:
+        places, fetched_at = cached
+    else:
+        places = search_places(activities, city, budget, clerk_user_id)
+        if clerk_user_id:
+            fetched_at = CandidateCache.put(
+                clerk_user_id, activities, city, budget, places, budget_from_prefs
+            )
 
-    with open(PLACES_PATH, "w") as f:
-        json.dump(places, f, indent=2)
+    def build():
+        dump_file(places, PLACES_PATH)
+        return places, 200
 
-    return jsonify(places)
+    if not clerk_user_id:
+        return jsonify(build()[0])
+    # The candidate set's fetch time is part of the version, so the cached body
+    # expires along with it instead of outliving CandidateCache.ttl_seconds.
+    version = (pref_version, fetched_at)
+    return cached_response("search", clerk_user_id, version, build)
 
 
 # Place types that are too generic to use as meaningful query signals
@@ -167,8 +220,7 @@ def next_places():
     if not coords:
         return jsonify({"error": "selectedPlaces must include at least one place with coordinates"}), 400
 
-    centroid_lat = sum(lat for lat, _ in coords) / len(coords)
-    centroid_lng = sum(lng for _, lng in coords) / len(coords)
+    centroid_lat, centroid_lng = centroid(coords)
 
     # --- Signal extraction (Phase 1) ---
 
@@ -342,6 +394,7 @@ def save_preferences():
     )
 
     PreferenceStore.set(pref_obj)
+    CandidateCache.rescore_user(pref_obj.clerkUserId, map_budget(pref_obj.budget or "moderate"))
 
     return jsonify({"ok": True, "preference": PreferenceStore.get(clerk_user_id)}), 200
 
@@ -351,12 +404,14 @@ def get_preferences():
     clerk_user_id = request.args.get("clerkUserId")
     if not clerk_user_id:
         return jsonify({"error": "clerkUserId is required"}), 400
-    
-    preference = PreferenceStore.get(clerk_user_id)
-    if not preference:
-        return jsonify({"error": "Preferences not found for this user"}), 404
-    
-    return jsonify({"ok": True, "preference": preference}), 200
+
+    def build():
+        preference = PreferenceStore.get(clerk_user_id)
+        if not preference:
+            return {"error": "Preferences not found for this user"}, 404
+        return {"ok": True, "preference": preference}, 200
+
+    return cached_response("preferences", clerk_user_id, PreferenceStore.version(clerk_user_id), build)
 
 
 
@@ -385,11 +440,15 @@ def get_pins():
     if not clerk_user_id:
         return jsonify({"error": "clerkUserId is required"}), 400
     itinerary_id = request.args.get("itineraryId")
-    if itinerary_id:
-        pins = PinStore.get_by_itinerary(clerk_user_id, itinerary_id)
-    else:
-        pins = PinStore.get_by_user(clerk_user_id)
-    return jsonify({"pins": pins}), 200
+
+    def build():
+        if itinerary_id:
+            pins = PinStore.get_by_itinerary(clerk_user_id, itinerary_id)
+        else:
+            pins = PinStore.get_by_user(clerk_user_id)
+        return {"pins": pins}, 200
+
+    return cached_response("pins", clerk_user_id, PinStore.version(clerk_user_id), build)
 
 
 @app.route("/pins/<pin_id>", methods=["GET"])
@@ -431,8 +490,45 @@ def get_itineraries():
     clerk_user_id = request.args.get("clerkUserId")
     if not clerk_user_id:
         return jsonify({"error": "clerkUserId is required"}), 400
-    itineraries = ItineraryStore.get_by_user(clerk_user_id)
-    return jsonify({"itineraries": itineraries}), 200
+
+    def build():
+        return {"itineraries": ItineraryStore.get_by_user(clerk_user_id)}, 200
+
+    return cached_response("itineraries", clerk_user_id, ItineraryStore.version(clerk_user_id), build)
+
+
+@app.route("/itineraries/<itinerary_id>/days", methods=["GET"])
+def get_itinerary_days(itinerary_id):
+    """Group an itinerary's pinned places into day plans by location."""
+    clerk_user_id = request.args.get("clerkUserId")
+    if not clerk_user_id:
+        return jsonify({"error": "clerkUserId is required"}), 400
+    try:
+        max_stops = int(request.args.get("maxStops", 6))
+        days = int(request.args["days"]) if request.args.get("days") else None
+    except ValueError:
+        return jsonify({"error": "maxStops and days must be integers"}), 400
+    if max_stops < 1 or (days is not None and days < 1):
+        return jsonify({"error": "maxStops and days must be positive"}), 400
+
+    itinerary = ItineraryStore.get(itinerary_id)
+    if not itinerary or itinerary["clerk_user_id"] != clerk_user_id:
+        return jsonify({"error": "Itinerary not found"}), 404
+
+    def build():
+        pins = PinStore.get_by_itinerary(clerk_user_id, itinerary_id)
+        pin_places = [place for pin in pins for place in pin.get("places", [])]
+        # Pin places come from the client; only dedupe the ones that have a name
+        places = merge_places([p for p in pin_places if p.get("name")])
+        places += [p for p in pin_places if not p.get("name")]
+        try:
+            plan = cluster_places(places, max_stops, days=days)
+        except ValueError as e:
+            return {"error": str(e)}, 400
+        return {"itineraryId": itinerary_id, **plan}, 200
+
+    version = (PinStore.version(clerk_user_id), ItineraryStore.version(clerk_user_id))
+    return cached_response("itinerary-days", clerk_user_id, version, build)
 
 
 if __name__ == "__main__":
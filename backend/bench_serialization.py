@@ -0,0 +1,112 @@
+"""
+Micro-benchmark for the serialization layer.
+
+Compares the previous stdlib paths (flask.jsonify with the default provider,
+json.dump(..., indent=2) for the stores) against serialization.py on a
+/search-sized response and a pin store of realistic size.
+
+    python bench_serialization.py --places 60 --pins 2000
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import random
+import tempfile
+import timeit
+
+from flask import Flask, jsonify
+from flask.json.provider import DefaultJSONProvider
+
+import serialization
+from serialization import FastJSONProvider, dump_file
+
+
+def make_place(rng: random.Random, i: int) -> dict:
+    return {
+        "rating": round(rng.uniform(3, 5), 1),
+        "ratingCount": rng.randrange(5000),
+        "priceLevel": rng.choice([None, 0, 1, 2, 3, 4]),
+        "name": f"Place {i} – Downtown",
+        "openNow": rng.random() < 0.8,
+        "address": f"{rng.randrange(1, 9999)} Main St, Irvine, CA 92618, USA",
+        "score": rng.random(),
+        "image_url": f"https://places.googleapis.com/v1/places/{i:08d}/photos/abc/media?maxWidthPx=400&key=KEY",
+        "tags": ["Restaurants", "Cafes"][: rng.randint(1, 2)],
+        "types": ["cafe", "coffee_shop", "food", "point_of_interest", "establishment"],
+        "category": "Cafes",
+        "latitude": 33.68 + rng.gauss(0, 0.05),
+        "longitude": -117.82 + rng.gauss(0, 0.05),
+        "distanceKm": round(rng.uniform(0, 20), 2),
+    }
+
+
+def bench(label: str, fn, number: int) -> float:
+    best = min(timeit.repeat(fn, number=number, repeat=5)) / number * 1000
+    print(f"  {label:<28}{best:>9.3f} ms")
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--places", type=int, default=60, help="places in a /search response")
+    parser.add_argument("--pins", type=int, default=2000, help="pins in the store file")
+    parser.add_argument("--number", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    places = [make_place(rng, i) for i in range(args.places)]
+    pins = {
+        f"pin-{i}": {
+            "pin_id": f"pin-{i}",
+            "clerk_user_id": f"user_{i % 200}",
+            "itinerary_id": f"it-{i % 500}",
+            "place_names": [p["name"] for p in places[:3]],
+            "places": places[:3],
+            "created_at": "2026-01-01T00:00:00+00:00",
+        }
+        for i in range(args.pins)
+    }
+
+    stdlib_app = Flask("stdlib")
+    stdlib_app.json = DefaultJSONProvider(stdlib_app)
+    fast_app = Flask("fast")
+    fast_app.json = FastJSONProvider(fast_app)
+
+    print(f"serialization backend: {serialization.BACKEND}")
+
+    print(f"\njsonify, /search response with {args.places} places")
+    with stdlib_app.app_context():
+        before = bench("stdlib jsonify", lambda: jsonify(places).get_data(), args.number)
+    with fast_app.app_context():
+        after = bench("FastJSONProvider", lambda: jsonify(places).get_data(), args.number)
+    print(f"  speedup {before / after:.1f}x")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "pins_data.json")
+
+        def stdlib_write():
+            with open(path, "w") as f:
+                json.dump(pins, f, indent=2)
+
+        print(f"\nstore write, {args.pins} pins")
+        before = bench("json.dump(indent=2)", stdlib_write, max(1, args.number // 10))
+        stdlib_size = os.path.getsize(path)
+        after = bench("dump_file (compact)", lambda: dump_file(pins, path), max(1, args.number // 10))
+        print(f"  speedup {before / after:.1f}x, file {stdlib_size // 1024} KB -> {os.path.getsize(path) // 1024} KB")
+
+        print(f"\nstore load, {args.pins} pins")
+        stdlib_write()
+
+        def stdlib_load():
+            with open(path) as f:
+                json.load(f)
+
+        before = bench("json.load", stdlib_load, max(1, args.number // 10))
+        after = bench("load_file", lambda: serialization.load_file(path), max(1, args.number // 10))
+        print(f"  speedup {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
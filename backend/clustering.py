@@ -0,0 +1,207 @@
+from __future__ import annotations
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from place_utils import haversine_distances
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def _project(lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """
+    Equirectangular projection to a local km plane around the mean latitude.
+    Accurate enough at metro scale for k-means, where squared Euclidean
+    distances are needed.
+    """
+    cos_lat0 = math.cos(math.radians(float(lats.mean())))
+    x = EARTH_RADIUS_KM * np.radians(lngs) * cos_lat0
+    y = EARTH_RADIUS_KM * np.radians(lats)
+    return np.column_stack([x, y])
+
+
+def _sq_distances(points: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    """n x k matrix of squared distances."""
+    diff = points[:, None, :] - centers[None, :, :]
+    return np.einsum("nkd,nkd->nk", diff, diff)
+
+
+def _init_centers(points: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    """k-means++ seeding."""
+    centers = [points[rng.integers(len(points))]]
+    closest = _sq_distances(points, centers[0][None, :])[:, 0]
+    for _ in range(1, k):
+        total = closest.sum()
+        if total == 0:
+            idx = rng.integers(len(points))
+        else:
+            idx = rng.choice(len(points), p=closest / total)
+        centers.append(points[idx])
+        closest = np.minimum(closest, _sq_distances(points, points[idx][None, :])[:, 0])
+    return np.array(centers)
+
+
+def _assign(dist: np.ndarray, capacity: int) -> np.ndarray:
+    """
+    Capacitated assignment: points whose best cluster matters most (largest gap
+    to their second choice) pick first, each taking its nearest cluster that
+    still has room.
+    """
+    n, k = dist.shape
+    if k == 1:
+        return np.zeros(n, dtype=np.intp)
+
+    nearest_two = np.partition(dist, 1, axis=1)
+    regret = nearest_two[:, 1] - nearest_two[:, 0]
+    order = np.argsort(-regret, kind="stable")
+    nearest = np.argmin(dist, axis=1).tolist()
+
+    labels = np.empty(n, dtype=np.intp)
+    counts = [0] * k
+    penalty = np.zeros(k)
+    for i in order.tolist():
+        c = nearest[i]
+        if counts[c] >= capacity:
+            # Only points whose nearest cluster is already full need the row scan
+            c = int(np.argmin(dist[i] + penalty))
+        labels[i] = c
+        counts[c] += 1
+        if counts[c] >= capacity:
+            penalty[c] = np.inf
+    return labels
+
+
+def _update_centers(points: np.ndarray, labels: np.ndarray,
+                    centers: np.ndarray) -> Tuple[np.ndarray, float]:
+    """
+    Move each centre to the mean of its points (empty clusters stay put).
+    Returns the new centres and the largest squared distance any one moved.
+    """
+    k = len(centers)
+    counts = np.bincount(labels, minlength=k)
+    sums = np.stack([
+        np.bincount(labels, weights=points[:, 0], minlength=k),
+        np.bincount(labels, weights=points[:, 1], minlength=k),
+    ], axis=1)
+    occupied = counts > 0
+    new_centers = centers.copy()
+    new_centers[occupied] = sums[occupied] / counts[occupied, None]
+    diff = new_centers - centers
+    return new_centers, float(np.einsum("kd,kd->k", diff, diff).max())
+
+
+def balanced_kmeans(lats: np.ndarray, lngs: np.ndarray, k: int, capacity: int,
+                    max_iter: int = 50, refine_iter: int = 4, tol_km: float = 0.01,
+                    seed: int = 0) -> np.ndarray:
+    """
+    k-means on lat/lng with at most `capacity` points per cluster.
+    Vectorized Lloyd iterations place the centres, then up to `refine_iter`
+    capacitated passes pull them toward a feasible split. Both phases stop
+    once no centre moves more than `tol_km`; the capacitated phase rarely
+    gets there, since full clusters keep trading boundary points, hence the
+    small cap.
+    Returns a cluster label per point; some clusters may end up empty.
+    """
+    points = _project(lats, lngs)
+    rng = np.random.default_rng(seed)
+    centers = _init_centers(points, k, rng)
+    tol_sq = tol_km ** 2
+
+    for _ in range(max_iter):
+        labels = np.argmin(_sq_distances(points, centers), axis=1)
+        centers, moved = _update_centers(points, labels, centers)
+        if moved < tol_sq:
+            break
+
+    for _ in range(refine_iter):
+        labels = _assign(_sq_distances(points, centers), capacity)
+        centers, moved = _update_centers(points, labels, centers)
+        if moved < tol_sq:
+            break
+    return _assign(_sq_distances(points, centers), capacity)
+
+
+def _fill_empty(labels: np.ndarray, points: np.ndarray, k: int) -> np.ndarray:
+    """
+    Give every empty cluster one point, taken from the currently largest
+    cluster: the member farthest from that cluster's centre. Needs n >= k.
+    """
+    labels = labels.copy()
+    counts = np.bincount(labels, minlength=k)
+    for empty in np.flatnonzero(counts == 0):
+        donor = int(np.argmax(counts))
+        members = np.flatnonzero(labels == donor)
+        center = points[members].mean(axis=0)
+        far = members[int(np.argmax(_sq_distances(points[members], center[None, :])[:, 0]))]
+        labels[far] = empty
+        counts[donor] -= 1
+        counts[empty] += 1
+    return labels
+
+
+def _visit_order(points: np.ndarray) -> List[int]:
+    """Nearest-neighbour walk, starting from the point closest to the group's centre."""
+    dist = _sq_distances(points, points)
+    remaining = np.ones(len(points), dtype=bool)
+    current = int(np.argmin(_sq_distances(points, points.mean(axis=0)[None, :])[:, 0]))
+    order = []
+    for _ in range(len(points)):
+        order.append(current)
+        remaining[current] = False
+        if not remaining.any():
+            break
+        current = int(np.argmin(np.where(remaining, dist[current], np.inf)))
+    return order
+
+
+def cluster_places(places: List[Dict[str, Any]], max_stops: int,
+                   days: Optional[int] = None, seed: int = 0) -> Dict[str, Any]:
+    """
+    Split places into day-sized geographic groups of at most `max_stops` each.
+    With `days`, that many groups are formed, or one per place if there are
+    fewer places than days (raises ValueError if days * max_stops can't fit
+    them); otherwise as few as the cap allows. "dayCount" is the number of
+    groups actually returned. Places without coordinates are returned under
+    "unplaced".
+    """
+    located, unplaced = [], []
+    for p in places:
+        has_coords = p.get("latitude") is not None and p.get("longitude") is not None
+        (located if has_coords else unplaced).append(p)
+    if not located:
+        return {"dayCount": 0, "days": [], "unplaced": unplaced}
+
+    n = len(located)
+    k = days or math.ceil(n / max_stops)
+    if k * max_stops < n:
+        raise ValueError(f"{n} places don't fit in {k} days of at most {max_stops} stops")
+    k = min(k, n)
+
+    lats = np.array([p["latitude"] for p in located], dtype=np.float64)
+    lngs = np.array([p["longitude"] for p in located], dtype=np.float64)
+    labels = balanced_kmeans(lats, lngs, k, max_stops, seed=seed)
+    points = _project(lats, lngs)
+    if days:
+        # Coincident or tightly packed places can leave clusters empty
+        labels = _fill_empty(labels, points, k)
+
+    groups = []
+    for c in range(k):
+        idx = np.flatnonzero(labels == c)
+        if len(idx) == 0:
+            continue
+        idx = idx[_visit_order(points[idx])]
+        center_lat, center_lng = lats[idx].mean(), lngs[idx].mean()
+        spread = haversine_distances(center_lat, center_lng, lats[idx], lngs[idx])
+        groups.append({
+            "centroid": {"latitude": float(center_lat), "longitude": float(center_lng)},
+            "radiusKm": round(float(spread.max()) / 1000, 2),
+            "places": [located[i] for i in idx],
+        })
+
+    # Number the days west to east so neighbouring days are neighbouring areas
+    groups.sort(key=lambda g: g["centroid"]["longitude"])
+    for day, group in enumerate(groups, start=1):
+        group["day"] = day
+    return {"dayCount": len(groups), "days": groups, "unplaced": unplaced}
@@ -1,10 +1,11 @@
 from __future__ import annotations
-import json
-import os
+import threading
 import uuid
 from dataclasses import dataclass, field, asdict
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, MutableMapping, Optional
+
+from snapshot import dump_records, group_values, load_records
 
 
 @dataclass
@@ -20,38 +21,55 @@ class Itinerary:
 class ItineraryStore:
     """
     File-backed itinerary store, keyed by itinerary_id.
+    Uses itineraries_data.snap instead of the JSON file when one exists.
+    Keeps a per-user version, bumped on every save, for ETags.
+    A class-level lock serializes reads and writes across request threads.
     """
-    itineraries: Dict[str, Dict[str, Any]] = {}
+    itineraries: MutableMapping[str, Dict[str, Any]] = {}
+    versions: Dict[str, int] = {}
     _path: Optional[str] = None
+    _lock = threading.RLock()
 
     @classmethod
     def init(cls, path: str) -> None:
-        cls._path = path
-        if os.path.exists(path):
-            with open(path, "r") as f:
-                cls.itineraries = json.load(f)
-        else:
-            cls.itineraries = {}
+        with cls._lock:
+            records, cls._path = load_records(path)
+            cls.itineraries = records if records is not None else {}
+            cls.versions = {}
 
     @classmethod
     def save(cls, itinerary: Itinerary) -> None:
-        cls.itineraries[itinerary.itinerary_id] = asdict(itinerary)
-        cls._write()
+        with cls._lock:
+            previous = cls.itineraries.get(itinerary.itinerary_id)
+            cls.itineraries[itinerary.itinerary_id] = asdict(itinerary)
+            cls._bump(itinerary.clerk_user_id)
+            if previous and previous["clerk_user_id"] != itinerary.clerk_user_id:
+                cls._bump(previous["clerk_user_id"])
+            cls._write()
 
     @classmethod
     def get(cls, itinerary_id: str) -> Optional[Dict[str, Any]]:
-        return cls.itineraries.get(itinerary_id)
+        with cls._lock:
+            return cls.itineraries.get(itinerary_id)
 
     @classmethod
     def get_by_user(cls, clerk_user_id: str) -> List[Dict[str, Any]]:
-        return [
-            i for i in cls.itineraries.values()
-            if i["clerk_user_id"] == clerk_user_id
-        ]
+        with cls._lock:
+            return [
+                i for i in group_values(cls.itineraries, clerk_user_id)
+                if i["clerk_user_id"] == clerk_user_id
+            ]
+
+    @classmethod
+    def version(cls, clerk_user_id: str) -> int:
+        with cls._lock:
+            return cls.versions.get(clerk_user_id, 0)
+
+    @classmethod
+    def _bump(cls, clerk_user_id: str) -> None:
+        cls.versions[clerk_user_id] = cls.versions.get(clerk_user_id, 0) + 1
 
     @classmethod
     def _write(cls) -> None:
         if cls._path:
-            os.makedirs(os.path.dirname(cls._path), exist_ok=True)
-            with open(cls._path, "w") as f:
-                json.dump(cls.itineraries, f, indent=2)
+            dump_records(cls.itineraries, cls._path)
@@ -0,0 +1,363 @@
+"""
+End-to-end load generator for the Flask API.
+
+Serves `app` on a local threaded server, points place_utils at a local Places
+stand-in with injected latency, and drives it with concurrent virtual users
+replaying the app's flow: onboarding preferences, /search for a city from
+states_and_cities.json, a few /next-places rounds, then saving the itinerary
+and its pins and polling the read endpoints with If-None-Match, as the app
+does on screen focus.
+
+    python loadtest.py --concurrency 1,8,32 --duration 20 --places-latency-ms 150
+
+Stores are pointed at a temporary directory, so real data is never touched.
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+import requests
+from werkzeug.serving import make_server
+
+import app as backend
+import place_utils
+from itineraries import ItineraryStore
+from pins import PinStore
+from preferences import PreferenceStore
+from response_cache import ResponseCache
+
+ASSETS_DIR = os.path.join(os.path.dirname(__file__), '..', 'frontend', 'assets')
+
+with open(os.path.join(ASSETS_DIR, 'states_and_cities.json')) as f:
+    STATES_AND_CITIES: Dict[str, List[str]] = json.load(f)
+with open(os.path.join(ASSETS_DIR, 'us_state_abbrev.json')) as f:
+    STATE_ABBREV: Dict[str, str] = json.load(f)
+with open(os.path.join(ASSETS_DIR, 'google_place_types.json')) as f:
+    PLACE_TYPES: Dict[str, List[str]] = json.load(f)
+
+# Same "City, ST" strings the create-itinerary flow sends
+CITIES = [
+    f"{city}, {STATE_ABBREV[state]}"
+    for state, cities in STATES_AND_CITIES.items() if state in STATE_ABBREV
+    for city in cities
+]
+ACTIVITIES = list(PLACE_TYPES)
+BUDGETS = ["budget", "moderate", "luxury"]
+DISTANCES = ["5 miles", "10 miles", "25 miles", "50 miles", "100 miles", "250+ miles"]
+TRANSPORT_MODES = ["car", "walking", "public", "plane"]
+PRICE_LEVELS = [
+    None, "PRICE_LEVEL_FREE", "PRICE_LEVEL_INEXPENSIVE", "PRICE_LEVEL_MODERATE",
+    "PRICE_LEVEL_EXPENSIVE", "PRICE_LEVEL_VERY_EXPENSIVE",
+]
+
+
+# --- Places stand-in ---
+
+def fake_places(query: str, body: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Deterministic searchText response for a query, clustered around a per-city point."""
+    rng = random.Random(query)
+    city = query.rsplit(" near ", 1)[-1]
+    city_rng = random.Random(city)
+    bias = (body.get("locationBias") or {}).get("circle", {}).get("center")
+    lat0 = bias["latitude"] if bias else city_rng.uniform(26.0, 47.0)
+    lng0 = bias["longitude"] if bias else city_rng.uniform(-122.0, -71.0)
+    type_pool = [body["includedType"]] if body.get("includedType") else rng.choice(list(PLACE_TYPES.values()))
+
+    places = []
+    for i in range(body.get("maxResultCount") or 20):
+        places.append({
+            "displayName": {"text": f"{query} #{rng.randrange(1000)}-{i}"},
+            "formattedAddress": f"{rng.randrange(1, 9999)} Main St, {city}",
+            "priceLevel": rng.choice(PRICE_LEVELS),
+            "rating": round(rng.uniform(3.0, 5.0), 1),
+            "userRatingCount": rng.randrange(0, 5000),
+            "regularOpeningHours": {"openNow": rng.random() < 0.8},
+            "location": {
+                "latitude": lat0 + rng.gauss(0, 0.02),
+                "longitude": lng0 + rng.gauss(0, 0.02),
+            },
+            "types": rng.sample(type_pool, min(2, len(type_pool))) + ["point_of_interest", "establishment"],
+        })
+    return [p for p in places if p["priceLevel"] is not None or rng.random() < 0.5]
+
+
+def start_places_stub(latency_ms: float, jitter_ms: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            delay = max(0.0, random.gauss(latency_ms, jitter_ms)) / 1000
+            time.sleep(delay)
+            payload = json.dumps({"places": fake_places(body.get("textQuery", ""), body)}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_backend() -> Any:
+    server = make_server("127.0.0.1", 0, backend.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def isolate_stores(data_dir: str) -> None:
+    backend.PLACES_PATH = os.path.join(data_dir, 'places_data.json')
+    PreferenceStore.preferences = {}
+    PreferenceStore.init(os.path.join(data_dir, 'user_preferences.json'))
+    PinStore.init(os.path.join(data_dir, 'pins_data.json'))
+    ItineraryStore.init(os.path.join(data_dir, 'itineraries_data.json'))
+    # Store versions restart with the fresh stores, so drop bodies cached against the old ones
+    ResponseCache.clear()
+
+
+# --- Virtual users ---
+
+class Recorder:
+    """Thread-safe per-endpoint latency, error and 304 collection."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.not_modified: Dict[str, int] = defaultdict(int)
+
+    def record(self, endpoint: str, seconds: float, ok: bool, not_modified: bool = False) -> None:
+        with self._lock:
+            self.latencies[endpoint].append(seconds)
+            if not ok:
+                self.errors[endpoint] += 1
+            if not_modified:
+                self.not_modified[endpoint] += 1
+
+
+class VirtualUser:
+    def __init__(self, base_url: str, recorder: Recorder, rng: random.Random) -> None:
+        self.base_url = base_url
+        self.recorder = recorder
+        self.rng = rng
+        self.session = requests.Session()
+        self.clerk_user_id = f"load-{uuid.uuid4().hex[:12]}"
+        # (path, params) -> (ETag, body) from the last 200, as the app's query cache keeps
+        self.etags: Dict[Any, Any] = {}
+
+    def call(self, endpoint: str, method: str, path: str, **kwargs) -> Optional[Any]:
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, self.base_url + path, timeout=60, **kwargs)
+            ok = response.status_code < 400
+            body = response.json() if ok else None
+        except (requests.RequestException, ValueError):
+            ok, body = False, None
+        self.recorder.record(endpoint, time.perf_counter() - start, ok)
+        return body
+
+    def poll(self, endpoint: str, path: str, params: Dict[str, str]) -> Optional[Any]:
+        """Conditional GET: replays the last ETag and reuses the body on a 304."""
+        cache_key = (path, tuple(sorted(params.items())))
+        cached = self.etags.get(cache_key)
+        headers = {"If-None-Match": cached[0]} if cached else {}
+
+        start = time.perf_counter()
+        not_modified = False
+        try:
+            response = self.session.get(self.base_url + path, params=params, headers=headers, timeout=60)
+            if response.status_code == 304 and cached:
+                ok, not_modified, body = True, True, cached[1]
+            else:
+                ok = response.status_code < 400
+                body = response.json() if ok else None
+                if ok and response.headers.get("ETag"):
+                    self.etags[cache_key] = (response.headers["ETag"], body)
+        except (requests.RequestException, ValueError):
+            ok, body = False, None
+        self.recorder.record(endpoint, time.perf_counter() - start, ok, not_modified)
+        return body
+
+    def focus_screens(self, itinerary_id: str) -> None:
+        """The app refetches these on every screen focus, mostly without changes."""
+        self.poll("GET /users/preferences", "/users/preferences", {"clerkUserId": self.clerk_user_id})
+        self.poll("GET /itineraries", "/itineraries", {"clerkUserId": self.clerk_user_id})
+        self.poll("GET /pins", "/pins", {"clerkUserId": self.clerk_user_id, "itineraryId": itinerary_id})
+
+    def onboard(self) -> None:
+        self.call("POST /users/preferences", "POST", "/users/preferences", json={
+            "clerkUserId": self.clerk_user_id,
+            "preferences": {
+                "activities": self.rng.sample(ACTIVITIES, self.rng.randint(1, 3)),
+                "budget": self.rng.choice(BUDGETS),
+                "travelDistance": self.rng.choice(DISTANCES),
+                "transportModes": self.rng.sample(TRANSPORT_MODES, self.rng.randint(1, 2)),
+            },
+        })
+
+    def plan_trip(self) -> None:
+        rng = self.rng
+        city = rng.choice(CITIES)
+        self.poll("GET /users/preferences", "/users/preferences", {"clerkUserId": self.clerk_user_id})
+
+        places = self.call("GET /search", "GET", "/search",
+                           params={"clerkUserId": self.clerk_user_id, "city": city}) or []
+        if not places:
+            return
+
+        itinerary_id = str(uuid.uuid4())
+        selected = [rng.choice(places[:5])]
+        for _ in range(rng.randint(1, 4)):
+            options = self.call("POST /next-places", "POST", "/next-places", json={
+                "clerkUserId": self.clerk_user_id,
+                "selectedPlaces": selected,
+                "city": city,
+                "excludeNames": [p["name"] for p in selected],
+            }) or []
+            if not options:
+                break
+            selected.append(rng.choice(options[:3]))
+
+        self.call("POST /itineraries", "POST", "/itineraries", json={
+            "clerkUserId": self.clerk_user_id,
+            "itineraryId": itinerary_id,
+            "name": f"Trip to {city}",
+            "city": city,
+            "stopCount": len(selected),
+        })
+        for i in range(0, len(selected), 2):
+            stop = selected[i:i + 2]
+            self.call("POST /pins", "POST", "/pins", json={
+                "clerkUserId": self.clerk_user_id,
+                "itineraryId": itinerary_id,
+                "placeNames": [p["name"] for p in stop],
+                "places": stop,
+            })
+
+        for _ in range(rng.randint(1, 3)):
+            self.focus_screens(itinerary_id)
+
+    def run(self, deadline: float) -> None:
+        self.onboard()
+        while time.monotonic() < deadline:
+            # Occasionally revisit onboarding, as users changing budget would
+            if self.rng.random() < 0.1:
+                self.onboard()
+            self.plan_trip()
+
+
+# --- Reporting ---
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return float("nan")
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(recorder: Recorder, elapsed: float) -> List[Dict[str, Any]]:
+    rows = []
+    for endpoint in sorted(recorder.latencies):
+        values = sorted(recorder.latencies[endpoint])
+        rows.append({
+            "endpoint": endpoint,
+            "requests": len(values),
+            "rps": len(values) / elapsed,
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+            "error_rate": recorder.errors[endpoint] / len(values),
+            "not_modified_rate": recorder.not_modified[endpoint] / len(values),
+        })
+    return rows
+
+
+def print_report(concurrency: int, elapsed: float, rows: List[Dict[str, Any]]) -> None:
+    total = sum(r["requests"] for r in rows)
+    errors = sum(r["requests"] * r["error_rate"] for r in rows)
+    print(f"\nconcurrency={concurrency}  elapsed={elapsed:.1f}s  "
+          f"total={total}  throughput={total / elapsed:.1f} req/s  errors={errors / max(total, 1):.2%}")
+    print(f"{'endpoint':<26}{'reqs':>7}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>9}{'304s':>9}")
+    for r in rows:
+        print(f"{r['endpoint']:<26}{r['requests']:>7}{r['rps']:>9.1f}{r['p50_ms']:>9.1f}"
+              f"{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}{r['error_rate']:>9.2%}{r['not_modified_rate']:>9.2%}")
+
+
+def run_level(base_url: str, concurrency: int, duration: float, seed: int) -> Dict[str, Any]:
+    recorder = Recorder()
+    deadline = time.monotonic() + duration
+    users = [VirtualUser(base_url, recorder, random.Random(seed + i)) for i in range(concurrency)]
+    threads = [threading.Thread(target=u.run, args=(deadline,)) for u in users]
+
+    start = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - start
+
+    rows = summarize(recorder, elapsed)
+    print_report(concurrency, elapsed, rows)
+    return {"concurrency": concurrency, "elapsed": elapsed, "endpoints": rows}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent load test for the Flask API.")
+    parser.add_argument("--concurrency", default="1,4,16",
+                        help="comma-separated virtual user counts, run one after another")
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds per concurrency level")
+    parser.add_argument("--places-latency-ms", type=float, default=150.0)
+    parser.add_argument("--places-jitter-ms", type=float, default=50.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--verbose", action="store_true", help="show request logs and server tracebacks")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+        backend.app.logger.disabled = True
+
+    stub = start_places_stub(args.places_latency_ms, args.places_jitter_ms)
+    place_utils.PLACES_SEARCH_URL = f"http://127.0.0.1:{stub.server_port}/v1/places:searchText"
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        isolate_stores(data_dir)
+        server = start_backend()
+        base_url = f"http://127.0.0.1:{server.server_port}"
+
+        results = [
+            run_level(base_url, int(level), args.duration, args.seed)
+            for level in args.concurrency.split(",") if level.strip()
+        ]
+        server.shutdown()
+    stub.shutdown()
+
+    # Saturation: the first level where adding users stops adding throughput
+    prev = None
+    for result in results:
+        throughput = sum(r["requests"] for r in result["endpoints"]) / result["elapsed"]
+        if prev and throughput < prev[1] * 1.1:
+            print(f"\nthroughput saturates between {prev[0]} and {result['concurrency']} virtual users")
+            break
+        prev = (result["concurrency"], throughput)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
@@ -1,10 +1,11 @@
 from __future__ import annotations
-import json
-import os
+import threading
 import uuid
 from dataclasses import dataclass, field, asdict
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, MutableMapping, Optional
+
+from snapshot import dump_records, group_values, load_records
 
 
 @dataclass
@@ -28,53 +29,75 @@ class Pin:
 class PinStore:
     """
     File-backed pin store.
-    - Loads from disk on init so pins survive server restarts.
+    - Loads from disk on init so pins survive server restarts. If a snapshot
+      (pins_data.snap) sits next to the JSON file it is used instead, and pins
+      are paged in per user on first access.
     - Writes to disk on every save/delete.
     - Keyed by pin_id.
+    - Keeps a per-user version, bumped on every save/delete, for ETags.
+    - A class-level lock serializes reads and writes across request threads.
     """
-    pins: Dict[str, Dict[str, Any]] = {}
+    pins: MutableMapping[str, Dict[str, Any]] = {}
+    versions: Dict[str, int] = {}
     _path: Optional[str] = None
+    _lock = threading.RLock()
 
     @classmethod
     def init(cls, path: str) -> None:
-        cls._path = path
-        if os.path.exists(path):
-            with open(path, "r") as f:
-                cls.pins = json.load(f)
-        else:
-            cls.pins = {}
+        with cls._lock:
+            records, cls._path = load_records(path)
+            cls.pins = records if records is not None else {}
+            cls.versions = {}
 
     @classmethod
     def save(cls, pin: Pin) -> None:
-        cls.pins[pin.pin_id] = asdict(pin)
-        cls._write()
+        with cls._lock:
+            previous = cls.pins.get(pin.pin_id)
+            cls.pins[pin.pin_id] = asdict(pin)
+            cls._bump(pin.clerk_user_id)
+            if previous and previous["clerk_user_id"] != pin.clerk_user_id:
+                cls._bump(previous["clerk_user_id"])
+            cls._write()
 
     @classmethod
     def get(cls, pin_id: str) -> Optional[Dict[str, Any]]:
-        return cls.pins.get(pin_id)
+        with cls._lock:
+            return cls.pins.get(pin_id)
 
     @classmethod
     def get_by_itinerary(cls, clerk_user_id: str, itinerary_id: str) -> List[Dict[str, Any]]:
-        return [
-            p for p in cls.pins.values()
-            if p["clerk_user_id"] == clerk_user_id and p["itinerary_id"] == itinerary_id
-        ]
+        with cls._lock:
+            return [
+                p for p in group_values(cls.pins, clerk_user_id)
+                if p["clerk_user_id"] == clerk_user_id and p["itinerary_id"] == itinerary_id
+            ]
 
     @classmethod
     def get_by_user(cls, clerk_user_id: str) -> List[Dict[str, Any]]:
-        return [p for p in cls.pins.values() if p["clerk_user_id"] == clerk_user_id]
+        with cls._lock:
+            return [p for p in group_values(cls.pins, clerk_user_id) if p["clerk_user_id"] == clerk_user_id]
 
     @classmethod
     def delete(cls, pin_id: str) -> bool:
-        if pin_id in cls.pins:
+        with cls._lock:
+            pin = cls.pins.get(pin_id)
+            if pin is None:
+                return False
             del cls.pins[pin_id]
+            cls._bump(pin["clerk_user_id"])
             cls._write()
             return True
-        return False
+
+    @classmethod
+    def version(cls, clerk_user_id: str) -> int:
+        with cls._lock:
+            return cls.versions.get(clerk_user_id, 0)
+
+    @classmethod
+    def _bump(cls, clerk_user_id: str) -> None:
+        cls.versions[clerk_user_id] = cls.versions.get(clerk_user_id, 0) + 1
 
     @classmethod
     def _write(cls) -> None:
         if cls._path:
-            os.makedirs(os.path.dirname(cls._path), exist_ok=True)
-            with open(cls._path, "w") as f:
-                json.dump(cls.pins, f, indent=2)
+            dump_records(cls.pins, cls._path)
@@ -1,21 +1,31 @@
 import requests
+import functools
 import math
 import json
 import os
+import numpy as np
+
+PLACES_SEARCH_URL = "https://places.googleapis.com/v1/places:searchText"
 
 # Reverse lookup: google_place_type -> category name
 # e.g. "italian_restaurant" -> "Restaurants"
 _TYPE_TO_CATEGORY_PATH = os.path.join(
     os.path.dirname(__file__), '..', 'frontend', 'assets', 'place_type_to_category.json'
 )
-with open(_TYPE_TO_CATEGORY_PATH) as _f:
-    TYPE_TO_CATEGORY: dict[str, str] = json.load(_f)
+
+
+@functools.lru_cache(maxsize=None)
+def type_to_category() -> dict[str, str]:
+    """Load the type -> category map on first use rather than at import."""
+    with open(_TYPE_TO_CATEGORY_PATH) as f:
+        return json.load(f)
 
 
 def get_place_category(types: list[str]) -> str | None:
     """Return the first matching category for a list of Google place types."""
+    mapping = type_to_category()
     for t in types:
-        category = TYPE_TO_CATEGORY.get(t)
+        category = mapping.get(t)
         if category:
             return category
     return None
@@ -40,6 +50,23 @@ def haversine_distance(lat1, lng1, lat2, lng2):
     return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
 
 
+def haversine_distances(lat, lng, lats, lngs):
+    """Vectorized haversine_distance from one point to arrays of points, in meters."""
+    R = 6_371_000
+    phi1, phi2 = np.radians(lat), np.radians(np.asarray(lats, dtype=np.float64))
+    dphi = phi2 - phi1
+    dlambda = np.radians(np.asarray(lngs, dtype=np.float64) - lng)
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    return R * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def centroid(coords):
+    """Mean (lat, lng) of a non-empty list of (lat, lng) pairs."""
+    lat = sum(lat for lat, _ in coords) / len(coords)
+    lng = sum(lng for _, lng in coords) / len(coords)
+    return lat, lng
+
+
 def bayesian_avg(rating, num_ratings):
     m = 50 # arbitrary choice for minimum ratings, push higher for
     C = 4.0  # prior mean rating, could be global average
@@ -75,6 +102,24 @@ def compute_weighted_score(bscore, price, budget, start=None, end=None, distance
     return rating
 
 
+def compute_weighted_scores(bscores, prices, budget):
+    """
+    Vectorized compute_weighted_score for a batch of places without a distance
+    signal (the /search path). bscores and prices are parallel arrays; a price
+    of NaN (unknown) or 0 is treated as 1, matching `price or 1`.
+    Returns a float64 array of scores in [0, 1].
+    """
+    bscores = np.asarray(bscores, dtype=np.float64)
+    rating = np.minimum(bscores / 5.0, 1.0)
+    if budget is None:
+        return rating
+
+    prices = np.asarray(prices, dtype=np.float64)
+    prices = np.where(np.isnan(prices) | (prices == 0), 1.0, prices)
+    budget_match = (prices <= budget).astype(np.float64)
+    return 0.6 * rating + 0.4 * budget_match
+
+
 def extract_place_info(tag, api_key, place, budget, start=None, distance=None):
     PRICE_LEVEL_MAP = {
         "PRICE_LEVEL_FREE": 0,
@@ -150,7 +195,7 @@ def google_query(api_key, query, budget, tag=None, start=None, distance=None, lo
             }
         }
     response = requests.post(
-        "https://places.googleapis.com/v1/places:searchText",
+        PLACES_SEARCH_URL,
         json=body,
         headers=headers,
     )
@@ -1,8 +1,9 @@
 from __future__ import annotations
-import json
-import os
+import threading
 from dataclasses import dataclass, asdict
-from typing import Any, Dict, Optional
+from typing import Any, Dict, MutableMapping, Optional
+
+from snapshot import dump_records, load_records
 
 @dataclass
 class Preference:
@@ -16,38 +17,51 @@ class PreferenceStore:
     """
     File-backed preference store.
     - Loads from disk on init so preferences survive server restarts.
+      Reads user_preferences.snap lazily instead when one exists.
     - Writes to disk on every set().
     - Stores preferences per user, keyed by clerkUserId.
+    - Keeps a per-user version, bumped on every set(), for ETags.
+    - A class-level lock serializes reads and writes across request threads.
     """
-    preferences: Dict[str, Dict[str, Any]] = {}
+    preferences: MutableMapping[str, Dict[str, Any]] = {}
+    versions: Dict[str, int] = {}
     _path: Optional[str] = None
+    _lock = threading.RLock()
 
     @classmethod
     def init(cls, path: str) -> None:
-        cls._path = path
-        if os.path.exists(path):
-            with open(path, "r") as f:
-                data = json.load(f)
-                # Handle migration from single preference to multi-user preferences
-                if isinstance(data, dict) and "clerkUserId" in data:
-                    # Old format: single preference object
-                    clerk_user_id = data.get("clerkUserId")
-                    cls.preferences = {clerk_user_id: data}
-                elif isinstance(data, dict):
-                    # New format: dictionary of preferences keyed by clerkUserId
-                    cls.preferences = data
-                else:
-                    cls.preferences = {}
+        with cls._lock:
+            cls.versions = {}
+            data, cls._path = load_records(path)
+            if data is None:
+                return
+            # Handle migration from single preference to multi-user preferences
+            if isinstance(data, dict) and "clerkUserId" in data:
+                # Old format: single preference object
+                clerk_user_id = data.get("clerkUserId")
+                cls.preferences = {clerk_user_id: data}
+            elif isinstance(data, MutableMapping):
+                # New format: preferences keyed by clerkUserId (dict or snapshot)
+                cls.preferences = data
+            else:
+                cls.preferences = {}
 
     @classmethod
     def set(cls, pref: Preference) -> None:
         pref_dict = asdict(pref)
         clerk_user_id = pref.clerkUserId
-        cls.preferences[clerk_user_id] = pref_dict
-        if cls._path:
-            with open(cls._path, "w") as f:
-                json.dump(cls.preferences, f, indent=2)
+        with cls._lock:
+            cls.preferences[clerk_user_id] = pref_dict
+            cls.versions[clerk_user_id] = cls.versions.get(clerk_user_id, 0) + 1
+            if cls._path:
+                dump_records(cls.preferences, cls._path)
 
     @classmethod
     def get(cls, clerk_user_id: str) -> Optional[Dict[str, Any]]:
-        return cls.preferences.get(clerk_user_id)
+        with cls._lock:
+            return cls.preferences.get(clerk_user_id)
+
+    @classmethod
+    def version(cls, clerk_user_id: str) -> int:
+        with cls._lock:
+            return cls.versions.get(clerk_user_id, 0)
@@ -0,0 +1,150 @@
+from __future__ import annotations
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from place_utils import bayesian_avg, compute_weighted_scores
+
+CandidateKey = Tuple[Tuple[str, ...], str]
+
+
+@dataclass
+class CandidateSet:
+    places: List[Dict[str, Any]]
+    budget: Optional[int]
+    bscores: np.ndarray
+    prices: np.ndarray
+    budget_from_prefs: bool = True
+    fetched_at: float = field(default_factory=time.monotonic)
+
+    @staticmethod
+    def from_places(places: List[Dict[str, Any]], budget: Optional[int],
+                    budget_from_prefs: bool = True) -> "CandidateSet":
+        ratings = np.array([p.get("rating") or 0 for p in places], dtype=np.float64)
+        counts = np.array([p.get("ratingCount") or 0 for p in places], dtype=np.float64)
+        prices = np.array(
+            [np.nan if p.get("priceLevel") is None else p["priceLevel"] for p in places],
+            dtype=np.float64,
+        )
+        return CandidateSet(
+            places=places,
+            budget=budget,
+            bscores=bayesian_avg(ratings, counts),
+            prices=prices,
+            budget_from_prefs=budget_from_prefs,
+        )
+
+
+class CandidateCache:
+    """
+    In-memory cache of each user's recent /search candidate sets.
+    - Keyed by clerkUserId, then by (activities, city).
+    - Keeps the bayesian averages and price levels so a budget change can be
+      rescored with compute_weighted_scores instead of re-querying Google.
+    - Only entries scored under a different budget are rescored; the rest are
+      left untouched. A preferences change only touches entries whose budget
+      came from preferences, not searches that passed their own budget.
+    - Entries expire `ttl_seconds` after they were fetched, so repeated searches
+      still pick up new places and openNow changes. Bounded LRU over users and
+      over each user's searches.
+    """
+    entries: "OrderedDict[str, OrderedDict[CandidateKey, CandidateSet]]" = OrderedDict()
+    max_users: int = 1024
+    max_entries_per_user: int = 8
+    ttl_seconds: float = 300.0
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _key(activities: List[str], city: str) -> CandidateKey:
+        return (tuple(activities), city.strip().lower())
+
+    @classmethod
+    def put(cls, clerk_user_id: str, activities: List[str], city: str,
+            budget: Optional[int], places: List[Dict[str, Any]],
+            budget_from_prefs: bool = True) -> float:
+        """Cache a freshly fetched candidate set and return its fetch time."""
+        entry = CandidateSet.from_places(places, budget, budget_from_prefs)
+        with cls._lock:
+            user_entries = cls.entries.setdefault(clerk_user_id, OrderedDict())
+            cls.entries.move_to_end(clerk_user_id)
+            key = cls._key(activities, city)
+            user_entries[key] = entry
+            user_entries.move_to_end(key)
+            while len(user_entries) > cls.max_entries_per_user:
+                user_entries.popitem(last=False)
+            while len(cls.entries) > cls.max_users:
+                cls.entries.popitem(last=False)
+        return entry.fetched_at
+
+    @classmethod
+    def _live_entry(cls, clerk_user_id: str, key: CandidateKey) -> Optional[CandidateSet]:
+        """Look up an entry, dropping it if it has expired. Caller holds the lock."""
+        user_entries = cls.entries.get(clerk_user_id)
+        if not user_entries:
+            return None
+        entry = user_entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry.fetched_at > cls.ttl_seconds:
+            del user_entries[key]
+            if not user_entries:
+                del cls.entries[clerk_user_id]
+            return None
+        return entry
+
+    @classmethod
+    def get(cls, clerk_user_id: str, activities: List[str], city: str, budget: Optional[int],
+            budget_from_prefs: bool = True) -> Optional[Tuple[List[Dict[str, Any]], float]]:
+        """
+        Return (places, fetched_at) for this search, rescored if the budget
+        changed, or None if nothing live is cached.
+        """
+        key = cls._key(activities, city)
+        with cls._lock:
+            entry = cls._live_entry(clerk_user_id, key)
+            if entry is None:
+                return None
+            cls.entries.move_to_end(clerk_user_id)
+            cls.entries[clerk_user_id].move_to_end(key)
+            entry.budget_from_prefs = budget_from_prefs
+            if entry.budget != budget:
+                cls._rescore([entry], budget)
+            return entry.places, entry.fetched_at
+
+    @classmethod
+    def rescore_user(cls, clerk_user_id: str, budget: Optional[int]) -> int:
+        """
+        Rescore every cached candidate set for a user that was scored with their
+        preferences budget and whose budget differs from `budget`, in a single
+        vectorized pass. Returns the number of entries rescored.
+        """
+        with cls._lock:
+            stale = [
+                e for e in cls.entries.get(clerk_user_id, {}).values()
+                if e.budget_from_prefs and e.budget != budget
+            ]
+            if stale:
+                cls._rescore(stale, budget)
+            return len(stale)
+
+    @staticmethod
+    def _rescore(stale: List[CandidateSet], budget: Optional[int]) -> None:
+        """Rescore and re-rank entries in place. Caller holds the lock."""
+        bscores = np.concatenate([e.bscores for e in stale])
+        prices = np.concatenate([e.prices for e in stale])
+        scores = compute_weighted_scores(bscores, prices, budget)
+
+        offsets = np.cumsum([len(e.places) for e in stale])[:-1]
+        for entry, entry_scores in zip(stale, np.split(scores, offsets)):
+            # Stable descending sort, same tie order as sorted(..., reverse=True)
+            order = np.argsort(-entry_scores, kind="stable")
+            entry.places = [
+                {**entry.places[i], "score": float(entry_scores[i])} for i in order
+            ]
+            entry.bscores = entry.bscores[order]
+            entry.prices = entry.prices[order]
+            entry.budget = budget
@@ -0,0 +1,53 @@
+from __future__ import annotations
+import hashlib
+import json
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+CacheKey = Tuple[str, str, Tuple[Tuple[str, str], ...]]
+
+# Store versions restart at 0 with the process, so ETags from a previous run
+# must never match ones issued by this one.
+_EPOCH = uuid.uuid4().hex
+
+
+class ResponseCache:
+    """
+    Serialized JSON bodies for the read endpoints, keyed by (route, user, args).
+    - Each entry remembers the ETag it was built for. ETags are derived from the
+      per-user store versions, so a save/delete makes the entry stale and it is
+      rebuilt on next access.
+    - Bounded LRU; least recently used entries are dropped first.
+    """
+    entries: "OrderedDict[CacheKey, Tuple[str, bytes]]" = OrderedDict()
+    max_entries: int = 1024
+    _lock = threading.Lock()
+
+    @staticmethod
+    def etag(route: str, clerk_user_id: str, version: Any, args: Tuple[Tuple[str, str], ...]) -> str:
+        raw = json.dumps([_EPOCH, route, clerk_user_id, version, args])
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def get(cls, key: CacheKey, etag: str) -> Optional[bytes]:
+        with cls._lock:
+            entry = cls.entries.get(key)
+            if entry is None or entry[0] != etag:
+                return None
+            cls.entries.move_to_end(key)
+            return entry[1]
+
+    @classmethod
+    def put(cls, key: CacheKey, etag: str, body: bytes) -> None:
+        with cls._lock:
+            cls.entries[key] = (etag, body)
+            cls.entries.move_to_end(key)
+            while len(cls.entries) > cls.max_entries:
+                cls.entries.popitem(last=False)
+
+    @classmethod
+    def clear(cls) -> None:
+        with cls._lock:
+            cls.entries.clear()
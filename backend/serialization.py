@@ -0,0 +1,132 @@
+"""
+JSON encoding for responses and store files.
+
+Uses orjson when it is installed and falls back to the stdlib json module
+otherwise; orjson is several times faster on the large place lists /search
+and the pin store carry. The output of the two is not byte-for-byte the same,
+and not always the same data either:
+- orjson output is UTF-8 rather than \\u-escaped (the store files; responses
+  are UTF-8 either way, see FastJSONProvider).
+- orjson writes exponents without a plus sign or zero padding (1e16, 1.5e-7)
+  where json writes 1e+16 and 1.5e-07.
+- orjson writes NaN and Infinity as null, so they read back as None; json
+  writes the non-standard NaN and Infinity tokens.
+- orjson encodes numpy values natively; json raises TypeError on them.
+Integers wider than 64 bits, which orjson can't represent, go through the
+stdlib on both encode and decode.
+"""
+
+from __future__ import annotations
+import json
+from typing import Any, Callable, Optional
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+BACKEND = "orjson" if orjson else "json"
+
+# orjson.loads turns integers outside 64 bits into floats. Any run of 19+
+# digits might be one, so those documents are decoded by the stdlib instead.
+# Mapping every digit to "0" and searching for a run is a C-speed scan; a regex
+# takes longer than orjson's whole parse on the store files.
+_DIGITS_TO_ZERO = bytes(ord("0") if b in b"0123456789" else ord(" ") for b in range(256))
+_LONG_DIGIT_RUN = b"0" * 19
+
+
+def _orjson_option(pretty: bool, sort_keys: bool) -> int:
+    option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+    if pretty:
+        option |= orjson.OPT_INDENT_2
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    return option
+
+
+def dumps(obj: Any, pretty: bool = False, sort_keys: bool = False,
+          default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    """Encode obj as UTF-8 JSON bytes, compact unless pretty."""
+    if orjson:
+        try:
+            return orjson.dumps(obj, default=default, option=_orjson_option(pretty, sort_keys))
+        except orjson.JSONEncodeError:
+            pass  # e.g. an int wider than 64 bits; let json try
+    if pretty:
+        text = json.dumps(obj, indent=2, sort_keys=sort_keys, default=default)
+    else:
+        text = json.dumps(obj, separators=(",", ":"), sort_keys=sort_keys, default=default)
+    return text.encode("utf-8")
+
+
+def _has_long_digits(data: Any) -> bool:
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return _LONG_DIGIT_RUN in bytes(data).translate(_DIGITS_TO_ZERO)
+
+
+def loads(data: Any) -> Any:
+    if orjson and not _has_long_digits(data):
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def load_file(path: str) -> Any:
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+def dump_file(obj: Any, path: str, pretty: bool = False) -> None:
+    """Write obj to path; compact by default, as the stores keep it."""
+    with open(path, "wb") as f:
+        f.write(dumps(obj, pretty=pretty))
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson when it's available, so jsonify and
+    request.get_json skip the stdlib encoder.
+    - Responses are UTF-8 (`ensure_ascii` off). Setting it back on, or passing
+      any json.dumps argument orjson has no equivalent for, uses Flask's own
+      encoder for that call.
+    - Dates and other types orjson doesn't special-case still go through
+      Flask's `default`, so datetimes come out as HTTP dates as before.
+    - Keeps Flask's sorted keys and its debug-mode indentation. Float
+      exponents and NaN/Infinity still differ from Flask's encoder, as
+      described at the top of this module.
+    """
+    ensure_ascii = False
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        kwargs.setdefault("default", self.default)
+        kwargs.setdefault("ensure_ascii", self.ensure_ascii)
+        kwargs.setdefault("sort_keys", self.sort_keys)
+        if orjson is None or not self._orjson_compatible(kwargs):
+            return super().dumps(obj, **kwargs)
+
+        option = _orjson_option(kwargs.get("indent") is not None, kwargs["sort_keys"])
+        try:
+            encoded = orjson.dumps(
+                obj, default=kwargs["default"], option=option | orjson.OPT_PASSTHROUGH_DATETIME,
+            )
+        except orjson.JSONEncodeError:
+            return super().dumps(obj, **kwargs)
+        return encoded.decode("utf-8")
+
+    @staticmethod
+    def _orjson_compatible(kwargs: dict) -> bool:
+        """Whether orjson's output matches what json.dumps would write for these arguments."""
+        if kwargs["ensure_ascii"] or set(kwargs) - {"default", "ensure_ascii", "sort_keys",
+                                                    "indent", "separators"}:
+            return False
+        indent, separators = kwargs.get("indent"), kwargs.get("separators")
+        if indent is None:
+            return separators == (",", ":")
+        return indent == 2 and separators in (None, (",", ": "))
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return loads(s)
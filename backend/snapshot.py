@@ -0,0 +1,383 @@
+"""
+Binary snapshot format for the JSON-backed stores.
+
+A snapshot holds one compact JSON record per key, plus an index that lets a
+worker open the file in constant time and decode records on first access.
+
+Layout (little-endian):
+    header     magic, flags, count, entries/key_order/strings offsets
+    records    concatenated record payloads (zlib-compressed if FLAG_ZLIB)
+    entries    `count` fixed-width entries, sorted by (group, key)
+    key_order  `count` u32 entry positions, sorted by key
+    strings    utf-8 keys and groups referenced by the entries
+
+The group of a record is its owning user, so `get_by_user`-style lookups are a
+binary search over the entries instead of a scan over every record.
+"""
+
+from __future__ import annotations
+import argparse
+import mmap
+import os
+import struct
+import zlib
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from serialization import dump_file, dumps, load_file, loads
+
+MAGIC = b"ITNSNAP1"
+FLAG_ZLIB = 0x1
+SNAPSHOT_EXT = ".snap"
+
+_HEADER = struct.Struct("<8sIIQQQ")
+# record offset/length, key offset/length, group offset/length
+_ENTRY = struct.Struct("<QIQIQI")
+_POS = struct.Struct("<I")
+
+# Distinguishes "no such key" from a record that is JSON null
+_MISSING = object()
+
+
+def snapshot_path(json_path: str) -> str:
+    """data/pins_data.json -> data/pins_data.snap"""
+    return os.path.splitext(json_path)[0] + SNAPSHOT_EXT
+
+
+def default_group(key: str, record: Any) -> str:
+    """Records are grouped by their owning user; fall back to the key itself."""
+    if isinstance(record, dict):
+        group = record.get("clerk_user_id") or record.get("clerkUserId")
+        if group:
+            return str(group)
+    return key
+
+
+def encode_record(record: Any, compress: bool) -> bytes:
+    payload = dumps(record)
+    return zlib.compress(payload) if compress else payload
+
+
+def decode_record(payload: bytes, compress: bool) -> Any:
+    if compress:
+        payload = zlib.decompress(payload)
+    return loads(payload)
+
+
+class Snapshot:
+    """
+    Read-only, mmap-backed view of a snapshot file.
+    - Opening only reads the header; nothing is decoded up front.
+    - Key and group lookups binary-search the index in place.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, flags, count, entries_off, key_order_off, strings_off = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self._mm.close()
+            raise ValueError(f"{path} is not a snapshot file")
+        self.compressed = bool(flags & FLAG_ZLIB)
+        self._count = count
+        self._entries_off = entries_off
+        self._key_order_off = key_order_off
+        self._strings_off = strings_off
+
+    def close(self) -> None:
+        self._mm.close()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, key: str) -> bool:
+        return self._find(key) is not None
+
+    def _entry(self, i: int) -> Tuple[int, int, int, int, int, int]:
+        return _ENTRY.unpack_from(self._mm, self._entries_off + i * _ENTRY.size)
+
+    def _string(self, off: int, length: int) -> bytes:
+        start = self._strings_off + off
+        return self._mm[start:start + length]
+
+    def _entry_key(self, i: int) -> bytes:
+        _, _, key_off, key_len, _, _ = self._entry(i)
+        return self._string(key_off, key_len)
+
+    def _entry_group(self, i: int) -> bytes:
+        _, _, _, _, group_off, group_len = self._entry(i)
+        return self._string(group_off, group_len)
+
+    def _find(self, key: str) -> Optional[int]:
+        target = key.encode("utf-8")
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            i = _POS.unpack_from(self._mm, self._key_order_off + mid * _POS.size)[0]
+            k = self._entry_key(i)
+            if k < target:
+                lo = mid + 1
+            elif k > target:
+                hi = mid
+            else:
+                return i
+        return None
+
+    def raw(self, key: str) -> Optional[bytes]:
+        """Return the stored (possibly compressed) payload for key."""
+        i = self._find(key)
+        if i is None:
+            return None
+        rec_off, rec_len, _, _, _, _ = self._entry(i)
+        return self._mm[rec_off:rec_off + rec_len]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        payload = self.raw(key)
+        if payload is None:
+            return default
+        return decode_record(payload, self.compressed)
+
+    def keys(self) -> Iterator[str]:
+        for i in range(self._count):
+            yield self._entry_key(i).decode("utf-8")
+
+    def entries(self) -> Iterator[Tuple[str, str, bytes]]:
+        """(key, group, raw payload) for every record, in one pass over the index."""
+        table = self._mm[self._entries_off:self._entries_off + self._count * _ENTRY.size]
+        for rec_off, rec_len, key_off, key_len, group_off, group_len in _ENTRY.iter_unpack(table):
+            yield (
+                self._string(key_off, key_len).decode("utf-8"),
+                self._string(group_off, group_len).decode("utf-8"),
+                self._mm[rec_off:rec_off + rec_len],
+            )
+
+    def keys_in_group(self, group: str) -> List[str]:
+        target = group.encode("utf-8")
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._entry_group(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        keys = []
+        while lo < self._count and self._entry_group(lo) == target:
+            keys.append(self._entry_key(lo).decode("utf-8"))
+            lo += 1
+        return keys
+
+
+def write_snapshot(path: str, entries: Iterable[Tuple[str, str, bytes]], compress: bool = False) -> None:
+    """
+    Write (key, group, payload) entries to `path`. Payloads must already be
+    encoded with encode_record(..., compress). The file is replaced atomically.
+    """
+    rows = sorted(
+        ((key.encode("utf-8"), group.encode("utf-8"), payload) for key, group, payload in entries),
+        key=lambda r: (r[1], r[0]),
+    )
+
+    strings = bytearray()
+    string_offsets: Dict[bytes, int] = {}
+
+    def intern(s: bytes) -> int:
+        if s not in string_offsets:
+            string_offsets[s] = len(strings)
+            strings.extend(s)
+        return string_offsets[s]
+
+    records = bytearray()
+    index = bytearray()
+    for key, group, payload in rows:
+        rec_off = _HEADER.size + len(records)
+        records.extend(payload)
+        index.extend(_ENTRY.pack(rec_off, len(payload), intern(key), len(key), intern(group), len(group)))
+
+    key_order = bytearray()
+    for i in sorted(range(len(rows)), key=lambda i: rows[i][0]):
+        key_order.extend(_POS.pack(i))
+
+    entries_off = _HEADER.size + len(records)
+    key_order_off = entries_off + len(index)
+    strings_off = key_order_off + len(key_order)
+    header = _HEADER.pack(
+        MAGIC, FLAG_ZLIB if compress else 0, len(rows), entries_off, key_order_off, strings_off,
+    )
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(records)
+        f.write(index)
+        f.write(key_order)
+        f.write(strings)
+    os.replace(tmp_path, path)
+
+
+class LazyRecords(MutableMapping):
+    """
+    Dict-like overlay over a Snapshot, used by the stores in place of the dict
+    they would json.load.
+    - Records are decoded from the snapshot on first access and then cached.
+    - Writes and deletes stay in memory until save(), which copies untouched
+      payloads straight across without decoding them.
+    """
+
+    def __init__(self, snapshot: Snapshot) -> None:
+        self._snapshot = snapshot
+        self._cache: Dict[str, Any] = {}
+        self._dirty: set = set()
+        self._deleted: set = set()
+
+    @classmethod
+    def open(cls, path: str) -> "LazyRecords":
+        return cls(Snapshot(path))
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._deleted:
+            raise KeyError(key)
+        if key in self._cache:
+            return self._cache[key]
+        record = self._snapshot.get(key, _MISSING)
+        if record is _MISSING:
+            raise KeyError(key)
+        self._cache[key] = record
+        return record
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self._cache[key] = value
+        self._dirty.add(key)
+        self._deleted.discard(key)
+
+    def __delitem__(self, key: str) -> None:
+        if key not in self:
+            raise KeyError(key)
+        self._cache.pop(key, None)
+        self._dirty.discard(key)
+        if key in self._snapshot:
+            self._deleted.add(key)
+
+    def __contains__(self, key: object) -> bool:
+        if not isinstance(key, str) or key in self._deleted:
+            return False
+        return key in self._cache or key in self._snapshot
+
+    def __iter__(self) -> Iterator[str]:
+        for key in self._snapshot.keys():
+            if key not in self._deleted:
+                yield key
+        for key in self._dirty:
+            if key not in self._snapshot:
+                yield key
+
+    def __len__(self) -> int:
+        added = sum(1 for key in self._dirty if key not in self._snapshot)
+        return len(self._snapshot) - len(self._deleted) + added
+
+    def values_in_group(self, group: str) -> List[Any]:
+        """Records whose owner is `group`, paging in only that group's records."""
+        keys = [
+            key for key in self._snapshot.keys_in_group(group)
+            if key not in self._deleted and key not in self._dirty
+        ]
+        keys.extend(
+            key for key in self._dirty
+            if default_group(key, self._cache[key]) == group
+        )
+        return [self[key] for key in keys]
+
+    def save(self, path: str) -> None:
+        compress = self._snapshot.compressed
+        entries = [
+            (key, group, payload)
+            for key, group, payload in self._snapshot.entries()
+            if key not in self._deleted and key not in self._dirty
+        ]
+        for key in self._dirty:
+            record = self._cache[key]
+            entries.append((key, default_group(key, record), encode_record(record, compress)))
+        write_snapshot(path, entries, compress=compress)
+
+        self._snapshot.close()
+        self._snapshot = Snapshot(path)
+        self._dirty.clear()
+        self._deleted.clear()
+
+
+def group_values(records: MutableMapping, group: str) -> Iterable[Any]:
+    """Candidate records for a user: the group's records for a snapshot, everything for a dict."""
+    if isinstance(records, LazyRecords):
+        return records.values_in_group(group)
+    return records.values()
+
+
+def load_records(path: str) -> Tuple[Optional[MutableMapping], str]:
+    """
+    Open the snapshot next to `path` if one exists, otherwise load the JSON at `path`.
+    Returns (records, path to persist to); records is None if neither file exists.
+    """
+    snap = snapshot_path(path)
+    if os.path.exists(snap):
+        return LazyRecords.open(snap), snap
+    if os.path.exists(path):
+        return load_file(path), path
+    return None, path
+
+
+def dump_records(records: MutableMapping, path: str) -> None:
+    if isinstance(records, LazyRecords):
+        records.save(path)
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    dump_file(records, path)
+
+
+def import_json(json_path: str, snap_path: Optional[str] = None, compress: bool = False) -> str:
+    """Convert a store's JSON file into a snapshot. Returns the snapshot path."""
+    snap_path = snap_path or snapshot_path(json_path)
+    data = load_file(json_path)
+    if not isinstance(data, dict):
+        raise ValueError(f"{json_path} must contain a JSON object keyed by record id")
+    # Old single-preference format: one object with a clerkUserId at the top level
+    if "clerkUserId" in data:
+        data = {data["clerkUserId"]: data}
+    write_snapshot(
+        snap_path,
+        ((key, default_group(key, record), encode_record(record, compress)) for key, record in data.items()),
+        compress=compress,
+    )
+    return snap_path
+
+
+def export_json(snap_path: str, json_path: Optional[str] = None) -> str:
+    """Write a snapshot back out as (pretty-printed) JSON. Returns the JSON path."""
+    json_path = json_path or os.path.splitext(snap_path)[0] + ".json"
+    snapshot = Snapshot(snap_path)
+    try:
+        data = {key: snapshot.get(key) for key in snapshot.keys()}
+    finally:
+        snapshot.close()
+    dump_file(data, json_path, pretty=True)
+    return json_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert store files between JSON and snapshot format.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    imp = sub.add_parser("import", help="JSON store file -> snapshot (stores pick it up on next init)")
+    imp.add_argument("json_path")
+    imp.add_argument("-o", "--output")
+    imp.add_argument("--compress", action="store_true", help="zlib-compress each record")
+
+    exp = sub.add_parser("export", help="snapshot -> JSON store file")
+    exp.add_argument("snap_path")
+    exp.add_argument("-o", "--output")
+
+    args = parser.parse_args()
+    if args.command == "import":
+        print(import_json(args.json_path, args.output, compress=args.compress))
+    else:
+        print(export_json(args.snap_path, args.output))